@@ -1,17 +1,135 @@
 #!/usr/bin/env python3
+import atexit
+import gzip
+import hashlib
 import json
+import queue
 import sqlite3
+import stat
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from urllib.parse import urlparse
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 ROOT = Path(__file__).resolve().parents[1]
 DB_PATH = ROOT / "backend" / "smtg.db"
 WEB_PATH = ROOT / "web"
 
+HTTP_WORKERS = 8
+HTTP_BACKLOG = HTTP_WORKERS * 4
+REQUEST_TIMEOUT = 10
+DB_POOL_SIZE = HTTP_WORKERS
+MAX_BATCH_SESSIONS = 500
+RESPONSE_CACHE_TTL = 30
+
 ALLOWED_THEMES = {"light", "dark", "amoled", "calm_blue", "forest_green"}
 ALLOWED_RESPONSES = {"start_focus", "snooze", "dismiss"}
+ALLOWED_PLANS = {"free", "pro"}
+STATIC_ROUTES = {
+    "/": "index.html",
+    "/index.html": "index.html",
+    "/styles.css": "styles.css",
+    "/script.js": "script.js",
+    "/manifest.webmanifest": "manifest.webmanifest",
+    "/sw.js": "sw.js",
+}
+CONTENT_TYPES = {
+    ".html": "text/html",
+    ".css": "text/css",
+    ".js": "application/javascript",
+    ".json": "application/json",
+    ".svg": "image/svg+xml",
+    ".png": "image/png",
+    ".webmanifest": "application/manifest+json",
+}
+CACHEABLE_SUFFIXES = {".css", ".js", ".svg", ".png"}
+COMPRESSIBLE_SUFFIXES = {".html", ".css", ".js", ".json", ".svg", ".webmanifest"}
+STATIC_ENCODINGS = ("br", "gzip")
+STATIC_MAX_AGE = 3600
+STATIC_RECHECK_SECONDS = 2
+WEEKDAY_ORDER = ("1", "2", "3", "4", "5", "6", "0")
+SESSION_REQUIRED_FIELDS = ("app_name", "session_type", "duration_min")
+
+SQL_INSERT_SESSION = (
+    "INSERT INTO sessions(app_name, session_type, duration_min, productive, started_at, created_at) VALUES(?,?,?,?,?,?)"
+)
+
+SQL_BEHAVIOR_USAGE = """
+    SELECT COUNT(*) AS total,
+           COALESCE(SUM(session_type='scroll'),0) AS scrolls,
+           COALESCE(SUM(productive=1),0) AS productive,
+           COALESCE(AVG(CASE WHEN session_type='scroll' THEN duration_min END),0) AS avg_scroll,
+           COALESCE(SUM(session_type='scroll' AND hour >= 22),0) AS late
+    FROM sessions
+"""
+SQL_ROLLUP_SESSION = """
+    INSERT INTO daily_stats(day, total_min, scroll_min, focus_min)
+    SELECT date(?1), ?2, ?3, 0 WHERE date(?1) IS NOT NULL
+    ON CONFLICT(day) DO UPDATE SET
+      total_min = total_min + excluded.total_min,
+      scroll_min = scroll_min + excluded.scroll_min
+"""
+SQL_ROLLUP_FOCUS = """
+    INSERT INTO daily_stats(day, total_min, scroll_min, focus_min)
+    VALUES(date(?1), 0, 0, ?2)
+    ON CONFLICT(day) DO UPDATE SET focus_min = focus_min + excluded.focus_min
+"""
+SQL_REBUILD_DAILY_STATS = """
+    INSERT INTO daily_stats(day, total_min, scroll_min, focus_min)
+    SELECT day, SUM(total_min), SUM(scroll_min), SUM(focus_min)
+    FROM (
+      SELECT date(started_at) AS day, duration_min AS total_min,
+             CASE WHEN session_type='scroll' THEN duration_min ELSE 0 END AS scroll_min, 0 AS focus_min
+      FROM sessions
+      UNION ALL
+      SELECT date(created_at), 0, 0, completed_min FROM focus_sessions
+    )
+    WHERE day IS NOT NULL
+    GROUP BY day
+"""
+SQL_EXPORT_SESSIONS = """
+    SELECT id, app_name, session_type, duration_min, productive, started_at, created_at
+    FROM sessions ORDER BY started_at DESC LIMIT 100
+"""
+SQL_NUDGE_COUNTS = "SELECT COUNT(*) AS total, COALESCE(SUM(response='start_focus'),0) AS accepted FROM nudges"
+SQL_DASHBOARD_USAGE = """
+    SELECT p.name AS name,
+           p.goal_minutes AS goal,
+           COALESCE(d.total_min,0) AS total,
+           COALESCE(d.scroll_min,0) AS scrolling,
+           COALESCE(d.focus_min,0) AS focus_done,
+           (SELECT COUNT(*) FROM focus_sessions WHERE created_at >= datetime('now','-6 days')) AS streak
+    FROM profile p
+    LEFT JOIN daily_stats d ON d.day = date('now')
+    WHERE p.id = 1
+"""
+SQL_INSIGHT_WEEKLY = """
+    SELECT strftime('%w', started_at) as d, COALESCE(SUM(duration_min),0) as mins
+    FROM sessions
+    WHERE started_at >= datetime('now','-6 days')
+    GROUP BY d
+"""
+SQL_INSIGHT_TOP_HOUR = """
+    SELECT printf('%02d', hour) as h, COUNT(*) as c
+    FROM sessions
+    WHERE session_type='scroll' AND hour IS NOT NULL
+    GROUP BY hour
+    ORDER BY c DESC, hour DESC LIMIT 1
+"""
 
 INTEGRATIONS = {
     "instagram": {
@@ -37,18 +155,222 @@ INTEGRATIONS = {
 }
 
 
+def json_dumps(payload) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def json_loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data.decode("utf-8"))
+
+
+INTEGRATIONS_BODY = json_dumps({"integrations": INTEGRATIONS})
+
+_static_cache = {}
+_hot_static_cache = {}
+_response_cache = {}
+_write_gen = 0
+_write_lock = threading.Lock()
+_behavior_memo = (None, None)
+
+
 def now_iso() -> str:
-    return datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
 
 
-def db_conn():
-    conn = sqlite3.connect(DB_PATH)
+_db_pool = queue.LifoQueue(maxsize=DB_POOL_SIZE)
+_db_local = threading.local()
+
+
+def _open_conn():
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=134217728")
+    conn.execute("PRAGMA cache_size=-20000")
+    return conn
+
+
+def db_conn():
+    conn = getattr(_db_local, "conn", None)
+    if conn is None:
+        try:
+            conn = _db_pool.get_nowait()
+        except queue.Empty:
+            conn = _open_conn()
+        _db_local.conn = conn
     return conn
 
 
-def row_to_dict(row):
-    return {k: row[k] for k in row.keys()}
+def release_conn():
+    conn = getattr(_db_local, "conn", None)
+    if conn is None:
+        return
+    _db_local.conn = None
+    if conn.in_transaction:
+        conn.rollback()
+    try:
+        _db_pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
+
+@atexit.register
+def close_pool():
+    while True:
+        try:
+            _db_pool.get_nowait().close()
+        except queue.Empty:
+            return
+
+
+def bump_write_gen():
+    global _write_gen
+    with _write_lock:
+        _write_gen += 1
+
+
+def load_static(path: Path):
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    if not stat.S_ISREG(st.st_mode):
+        return None
+    entry = _static_cache.get(path)
+    if entry is None or entry[0] != st.st_mtime_ns or entry[2] != st.st_size:
+        variants = {}
+        if path.suffix in COMPRESSIBLE_SUFFIXES:
+            body = path.read_bytes()
+            etag = f'"{hashlib.sha1(body).hexdigest()}"'
+            # Compress once per file version; the encoded bodies are served from memory.
+            for encoding, data in compress_static(body).items():
+                variants[encoding] = (f'"{hashlib.sha1(data).hexdigest()}"', data)
+        else:
+            with path.open("rb") as f:
+                etag = f'"{hashlib.file_digest(f, "sha1").hexdigest()}"'
+        entry = (st.st_mtime_ns, int(st.st_mtime), st.st_size, etag, variants)
+        _static_cache[path] = entry
+    return entry
+
+
+def compress_static(body):
+    variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=11)
+    return variants
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        params = params.strip()
+        try:
+            q = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            q = 1.0
+        if q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def pick_encoding(headers, available):
+    if not available:
+        return None
+    accepted = accepted_encodings(headers.get("Accept-Encoding", ""))
+    for encoding in STATIC_ENCODINGS:
+        if encoding in accepted and encoding in available:
+            return encoding
+    return None
+
+
+def build_hot_static(name):
+    path = WEB_PATH / name
+    try:
+        st = path.stat()
+        body = path.read_bytes()
+    except OSError:
+        return None
+    bodies = {None: body}
+    compressible = path.suffix in COMPRESSIBLE_SUFFIXES
+    if compressible:
+        bodies.update(compress_static(body))
+    mtime = int(st.st_mtime)
+    variants = {}
+    for encoding, data in bodies.items():
+        etag = f'"{hashlib.sha1(data).hexdigest()}"'
+        lines = [
+            f"Content-Type: {CONTENT_TYPES.get(path.suffix, 'application/octet-stream')}",
+            f"Content-Length: {len(data)}",
+        ]
+        if encoding is not None:
+            lines.append(f"Content-Encoding: {encoding}")
+        if compressible:
+            lines.append("Vary: Accept-Encoding")
+        lines.append(f"ETag: {etag}")
+        lines.append(f"Last-Modified: {formatdate(mtime, usegmt=True)}")
+        if path.suffix in CACHEABLE_SUFFIXES:
+            lines.append(f"Cache-Control: public, max-age={STATIC_MAX_AGE}")
+        head = "".join(line + "\r\n" for line in lines)
+        variants[encoding] = (etag, mtime, head.encode("latin-1"), data)
+    return (st.st_mtime_ns, time.monotonic(), variants)
+
+
+def hot_static(name):
+    entry = _hot_static_cache.get(name)
+    if entry is not None and time.monotonic() - entry[1] < STATIC_RECHECK_SECONDS:
+        return entry[2]
+    try:
+        mtime_ns = (WEB_PATH / name).stat().st_mtime_ns
+    except OSError:
+        _hot_static_cache.pop(name, None)
+        return None
+    if entry is None or entry[0] != mtime_ns:
+        entry = build_hot_static(name)
+        if entry is None:
+            return None
+    else:
+        entry = (entry[0], time.monotonic(), entry[2])
+    _hot_static_cache[name] = entry
+    return entry[2]
+
+
+def load_hot_static():
+    for name in set(STATIC_ROUTES.values()):
+        hot_static(name)
+
+
+def not_modified(headers, etag, mtime):
+    if_none_match = headers.get("If-None-Match")
+    if if_none_match is not None:
+        return etag in (t.strip() for t in if_none_match.split(",")) or if_none_match.strip() == "*"
+    if_modified_since = headers.get("If-Modified-Since")
+    if if_modified_since:
+        try:
+            return mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def rows_to_dicts(cursor, rows):
+    cols = [d[0] for d in cursor.description]
+    return [dict(zip(cols, r)) for r in rows]
+
+
+def fetch_dicts(conn, sql):
+    cur = conn.execute(sql)
+    return rows_to_dicts(cur, cur.fetchall())
+
+
+def fetch_dict(conn, sql):
+    rows = fetch_dicts(conn, sql)
+    return rows[0] if rows else None
 
 
 def safe_int(value, default, minimum=None, maximum=None):
@@ -63,25 +385,45 @@ def safe_int(value, default, minimum=None, maximum=None):
     return parsed
 
 
+def session_row(data, ts):
+    if not isinstance(data, dict) or any(k not in data for k in SESSION_REQUIRED_FIELDS):
+        return None
+    return (
+        str(data["app_name"])[:100],
+        str(data["session_type"])[:50],
+        safe_int(data.get("duration_min"), 1, minimum=1, maximum=600),
+        safe_int(data.get("productive", 0), 0, minimum=0, maximum=1),
+        data.get("started_at", ts),
+        ts,
+    )
+
+
+def session_rollup(row):
+    return (row[4], row[2], row[2] if row[1] == "scroll" else 0)
+
+
 def build_behavior_analysis(conn):
-    total_sessions = conn.execute("SELECT COUNT(*) AS c FROM sessions").fetchone()["c"]
-    scroll_sessions = conn.execute("SELECT COUNT(*) AS c FROM sessions WHERE session_type='scroll'").fetchone()["c"]
-    productive_sessions = conn.execute("SELECT COUNT(*) AS c FROM sessions WHERE productive=1").fetchone()["c"]
-    avg_scroll_duration = conn.execute(
-        "SELECT COALESCE(AVG(duration_min),0) AS m FROM sessions WHERE session_type='scroll'"
-    ).fetchone()["m"]
-    late_scroll = conn.execute(
-        """
-        SELECT COUNT(*) AS c
-        FROM sessions
-        WHERE session_type='scroll'
-          AND CAST(strftime('%H', started_at) AS INTEGER) >= 22
-        """
-    ).fetchone()["c"]
-    nudge_total = conn.execute("SELECT COUNT(*) AS c FROM nudges").fetchone()["c"]
-    nudge_accept = conn.execute(
-        "SELECT COUNT(*) AS c FROM nudges WHERE response='start_focus'"
-    ).fetchone()["c"]
+    # Shared by /api/behavior/analyze and /api/insights; recomputed only after a write.
+    global _behavior_memo
+    gen = _write_gen
+    memo_gen, payload = _behavior_memo
+    if memo_gen == gen:
+        return payload
+    payload = _compute_behavior_analysis(conn)
+    _behavior_memo = (gen, payload)
+    return payload
+
+
+def _compute_behavior_analysis(conn):
+    usage = conn.execute(SQL_BEHAVIOR_USAGE).fetchone()
+    nudges = conn.execute(SQL_NUDGE_COUNTS).fetchone()
+    total_sessions = usage["total"]
+    scroll_sessions = usage["scrolls"]
+    productive_sessions = usage["productive"]
+    avg_scroll_duration = usage["avg_scroll"]
+    late_scroll = usage["late"]
+    nudge_total = nudges["total"]
+    nudge_accept = nudges["accepted"]
 
     scroll_ratio = 0 if total_sessions == 0 else round((scroll_sessions / total_sessions) * 100, 1)
     productivity_ratio = 0 if total_sessions == 0 else round((productive_sessions / total_sessions) * 100, 1)
@@ -108,9 +450,48 @@ def build_behavior_analysis(conn):
     }
 
 
+def build_dashboard(conn):
+    usage = conn.execute(SQL_DASHBOARD_USAGE).fetchone()
+    scrolling = usage["scrolling"]
+    focus_done = usage["focus_done"]
+    score = max(0, min(100, int(100 - (scrolling * 0.8) + (focus_done * 0.6))))
+    return {
+        "name": usage["name"],
+        "goal_minutes": usage["goal"],
+        "used_minutes": usage["total"],
+        "focus_saved_minutes": focus_done,
+        "focus_score": score,
+        "streak_days": min(usage["streak"], 7),
+    }
+
+
+def build_insights(conn):
+    weekly = conn.execute(SQL_INSIGHT_WEEKLY).fetchall()
+    top_hour = conn.execute(SQL_INSIGHT_TOP_HOUR).fetchone()
+    nudges = conn.execute(SQL_NUDGE_COUNTS).fetchone()
+    nudge_accept = nudges["accepted"]
+    nudge_total = nudges["total"]
+
+    by_day = {r["d"]: r["mins"] for r in weekly}
+    ordered = [by_day.get(d, 0) for d in WEEKDAY_ORDER]
+    accept_rate = 0 if nudge_total == 0 else round((nudge_accept / nudge_total) * 100, 1)
+    hour = top_hour["h"] if top_hour else "22"
+    behavior = build_behavior_analysis(conn)
+
+    return {
+        "weekly_minutes": ordered,
+        "time_saved_weekly": [18, 24, 31, 36],
+        "nudge_accept_rate": accept_rate,
+        "ai_sentence": f"Most scrolling happens after {hour}:00.",
+        "behavior_risk": behavior["risk_level"],
+        "scroll_ratio_pct": behavior["scroll_ratio_pct"],
+    }
+
+
 def init_db():
     conn = db_conn()
     cur = conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
     cur.executescript(
         """
         CREATE TABLE IF NOT EXISTS profile (
@@ -141,7 +522,8 @@ def init_db():
           duration_min INTEGER NOT NULL,
           productive INTEGER NOT NULL DEFAULT 0,
           started_at TEXT NOT NULL,
-          created_at TEXT NOT NULL
+          created_at TEXT NOT NULL,
+          hour INTEGER GENERATED ALWAYS AS (CAST(strftime('%H', started_at) AS INTEGER)) VIRTUAL
         );
 
         CREATE TABLE IF NOT EXISTS focus_sessions (
@@ -159,6 +541,13 @@ def init_db():
           created_at TEXT NOT NULL
         );
 
+        CREATE TABLE IF NOT EXISTS daily_stats (
+          day TEXT PRIMARY KEY,
+          total_min INTEGER NOT NULL DEFAULT 0,
+          scroll_min INTEGER NOT NULL DEFAULT 0,
+          focus_min INTEGER NOT NULL DEFAULT 0
+        );
+
         CREATE TABLE IF NOT EXISTS subscription (
           id INTEGER PRIMARY KEY CHECK (id = 1),
           plan TEXT NOT NULL DEFAULT 'free',
@@ -172,6 +561,23 @@ def init_db():
     if "onboarding_done" not in cols:
         cur.execute("ALTER TABLE settings ADD COLUMN onboarding_done INTEGER NOT NULL DEFAULT 0")
 
+    # table_info hides generated columns; table_xinfo lists them.
+    cols = [r[1] for r in cur.execute("PRAGMA table_xinfo(sessions)").fetchall()]
+    if "hour" not in cols:
+        cur.execute(
+            "ALTER TABLE sessions ADD COLUMN hour INTEGER GENERATED ALWAYS AS (CAST(strftime('%H', started_at) AS INTEGER)) VIRTUAL"
+        )
+
+    cur.executescript(
+        """
+        CREATE INDEX IF NOT EXISTS idx_sessions_started ON sessions(started_at);
+        CREATE INDEX IF NOT EXISTS idx_sessions_type_started ON sessions(session_type, started_at);
+        CREATE INDEX IF NOT EXISTS idx_sessions_hour_type ON sessions(session_type, hour);
+        CREATE INDEX IF NOT EXISTS idx_focus_created ON focus_sessions(created_at);
+        CREATE INDEX IF NOT EXISTS idx_nudges_response ON nudges(response);
+        """
+    )
+
     ts = now_iso()
 
     if not cur.execute("SELECT id FROM profile WHERE id = 1").fetchone():
@@ -203,20 +609,44 @@ def init_db():
             ("Instagram", "scroll", 18, 0),
         ]
         start = datetime.utcnow() - timedelta(days=6)
-        for i, row in enumerate(seed):
-            t = (start + timedelta(days=i, hours=3)).replace(microsecond=0).isoformat() + "Z"
-            cur.execute(
-                "INSERT INTO sessions(app_name, session_type, duration_min, productive, started_at, created_at) VALUES(?,?,?,?,?,?)",
-                (row[0], row[1], row[2], row[3], t, ts),
-            )
+        rows = [
+            (*row, (start + timedelta(days=i, hours=3)).replace(microsecond=0).isoformat() + "Z", ts)
+            for i, row in enumerate(seed)
+        ]
+        cur.executemany(SQL_INSERT_SESSION, rows)
+        # Seeding bypasses the per-insert rollup, so rebuild from scratch.
+        cur.execute("DELETE FROM daily_stats")
+        cur.execute(SQL_REBUILD_DAILY_STATS)
+    elif cur.execute("SELECT COUNT(*) AS c FROM daily_stats").fetchone()["c"] == 0:
+        cur.execute(SQL_REBUILD_DAILY_STATS)
 
     conn.commit()
-    conn.close()
+    release_conn()
 
 
 class Handler(BaseHTTPRequestHandler):
+    # Idle or stalled clients must not pin a pool worker indefinitely.
+    timeout = REQUEST_TIMEOUT
+
+    def handle_one_request(self):
+        try:
+            super().handle_one_request()
+        finally:
+            release_conn()
+
+    def parse_request(self):
+        if not super().parse_request():
+            return False
+        self._begin_request()
+        return True
+
+    def _begin_request(self):
+        self._ts = now_iso()
+
     def _send_json(self, payload, status=200):
-        body = json.dumps(payload).encode("utf-8")
+        self._send_json_bytes(json_dumps(payload), status)
+
+    def _send_json_bytes(self, body, status=200):
         self.send_response(status)
         self.send_header("Content-Type", "application/json")
         self.send_header("Content-Length", str(len(body)))
@@ -224,6 +654,15 @@ class Handler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(body)
 
+    def _send_cached_json(self, key, build):
+        gen = _write_gen
+        entry = _response_cache.get(key)
+        if entry is not None and entry[0] == gen and time.monotonic() - entry[1] < RESPONSE_CACHE_TTL:
+            return self._send_json_bytes(entry[2])
+        body = json_dumps(build())
+        _response_cache[key] = (gen, time.monotonic(), body)
+        self._send_json_bytes(body)
+
     def _send_error(self, status, message):
         self._send_json({"error": message}, status)
 
@@ -233,29 +672,68 @@ class Handler(BaseHTTPRequestHandler):
             return {}
         try:
             data = self.rfile.read(length)
-            return json.loads(data.decode("utf-8"))
+            return json_loads(data)
         except (json.JSONDecodeError, UnicodeDecodeError):
             return None
 
     def _send_file(self, path: Path):
-        if not path.exists() or path.is_dir():
+        # Resolve before touching the cache so "/web/../..." can neither escape
+        # web/ nor mint new cache keys.
+        path = path.resolve()
+        if not path.is_relative_to(WEB_PATH):
             self.send_error(404, "Not found")
             return
-        content = path.read_bytes()
-        ctype_map = {
-            ".html": "text/html",
-            ".css": "text/css",
-            ".js": "application/javascript",
-            ".json": "application/json",
-            ".svg": "image/svg+xml",
-            ".png": "image/png",
-            ".webmanifest": "application/manifest+json",
-        }
+        entry = load_static(path)
+        if entry is None:
+            self.send_error(404, "Not found")
+            return
+        _, mtime, size, etag, variants = entry
+        encoding = pick_encoding(self.headers, variants)
+        body = None
+        if encoding is not None:
+            etag, body = variants[encoding]
+            size = len(body)
+        if not_modified(self.headers, etag, mtime):
+            return self._send_not_modified(etag, bool(variants))
         self.send_response(200)
-        self.send_header("Content-Type", ctype_map.get(path.suffix, "application/octet-stream"))
-        self.send_header("Content-Length", str(len(content)))
+        self.send_header("Content-Type", CONTENT_TYPES.get(path.suffix, "application/octet-stream"))
+        self.send_header("Content-Length", str(size))
+        if encoding is not None:
+            self.send_header("Content-Encoding", encoding)
+        if variants:
+            self.send_header("Vary", "Accept-Encoding")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(mtime, usegmt=True))
+        if path.suffix in CACHEABLE_SUFFIXES:
+            self.send_header("Cache-Control", f"public, max-age={STATIC_MAX_AGE}")
+        self.end_headers()
+        if body is not None:
+            self.wfile.write(body)
+            return
+        with path.open("rb") as f:
+            # socket.sendfile uses os.sendfile where available and falls back to send().
+            self.connection.sendfile(f, 0, size)
+
+    def _send_static(self, name):
+        variants = hot_static(name)
+        if variants is None:
+            return self.send_error(404, "Not found")
+        etag, mtime, head, body = variants[pick_encoding(self.headers, variants)]
+        if not_modified(self.headers, etag, mtime):
+            return self._send_not_modified(etag, len(variants) > 1)
+        self.send_response(200)
+        # Emit the status line, Server and Date, then splice in the prebuilt header lines.
+        self.flush_headers()
+        self.wfile.write(head)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_not_modified(self, etag, vary):
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        if vary:
+            self.send_header("Vary", "Accept-Encoding")
         self.end_headers()
-        self.wfile.write(content)
 
     def do_OPTIONS(self):
         self.send_response(204)
@@ -266,200 +744,131 @@ class Handler(BaseHTTPRequestHandler):
 
     def do_GET(self):
         path = urlparse(self.path).path
-
-        if path in {"/", "/index.html"}:
-            return self._send_file(WEB_PATH / "index.html")
-        if path in {"/styles.css", "/script.js", "/manifest.webmanifest", "/sw.js"}:
-            return self._send_file(WEB_PATH / path.lstrip("/"))
+        static = STATIC_ROUTES.get(path)
+        if static is not None:
+            return self._send_static(static)
         if path.startswith("/web/"):
             return self._send_file(ROOT / path.lstrip("/"))
+        route = self._GET_ROUTES.get(path)
+        if route is None:
+            return self.send_error(404, "Not found")
+        route(self)
 
-        conn = db_conn()
-
-        if path == "/api/health":
-            conn.close()
-            return self._send_json({"ok": True, "timestamp": now_iso()})
-
-        if path == "/api/integrations":
-            conn.close()
-            return self._send_json({"integrations": INTEGRATIONS})
-
-        if path == "/api/behavior/analyze":
-            payload = build_behavior_analysis(conn)
-            conn.close()
-            return self._send_json({"behavior": payload})
-
-        if path == "/api/profile":
-            row = conn.execute("SELECT * FROM profile WHERE id = 1").fetchone()
-            conn.close()
-            return self._send_json({"profile": row_to_dict(row)})
-
-        if path == "/api/settings":
-            row = conn.execute("SELECT * FROM settings WHERE id = 1").fetchone()
-            conn.close()
-            return self._send_json({"settings": row_to_dict(row)})
-
-        if path == "/api/subscription":
-            row = conn.execute("SELECT * FROM subscription WHERE id = 1").fetchone()
-            conn.close()
-            return self._send_json({"subscription": row_to_dict(row)})
-
-        if path == "/api/dashboard":
-            p = conn.execute("SELECT * FROM profile WHERE id = 1").fetchone()
-            total = conn.execute(
-                "SELECT COALESCE(SUM(duration_min),0) as mins FROM sessions WHERE date(started_at)=date('now')"
-            ).fetchone()["mins"]
-            focus_done = conn.execute(
-                "SELECT COALESCE(SUM(completed_min),0) as mins FROM focus_sessions WHERE date(created_at)=date('now')"
-            ).fetchone()["mins"]
-            scrolling = conn.execute(
-                "SELECT COALESCE(SUM(duration_min),0) as mins FROM sessions WHERE session_type='scroll' AND date(started_at)=date('now')"
-            ).fetchone()["mins"]
-            streak = conn.execute(
-                "SELECT COUNT(*) AS c FROM focus_sessions WHERE created_at >= datetime('now','-6 days')"
-            ).fetchone()["c"]
-            conn.close()
-            score = max(0, min(100, int(100 - (scrolling * 0.8) + (focus_done * 0.6))))
-            return self._send_json(
-                {
-                    "dashboard": {
-                        "name": p["name"],
-                        "goal_minutes": p["goal_minutes"],
-                        "used_minutes": total,
-                        "focus_saved_minutes": focus_done,
-                        "focus_score": score,
-                        "streak_days": min(streak, 7),
-                    }
-                }
-            )
-
-        if path == "/api/insights":
-            weekly = conn.execute(
-                """
-                SELECT strftime('%w', started_at) as d, COALESCE(SUM(duration_min),0) as mins
-                FROM sessions
-                WHERE started_at >= datetime('now','-6 days')
-                GROUP BY d
-                """
-            ).fetchall()
-            top_hour = conn.execute(
-                """
-                SELECT strftime('%H', started_at) as h, COUNT(*) as c
-                FROM sessions
-                WHERE session_type='scroll'
-                GROUP BY h
-                ORDER BY c DESC, h DESC LIMIT 1
-                """
-            ).fetchone()
-            nudge_accept = conn.execute(
-                "SELECT COUNT(*) as c FROM nudges WHERE response='start_focus'"
-            ).fetchone()["c"]
-            nudge_total = conn.execute("SELECT COUNT(*) as c FROM nudges").fetchone()["c"]
-
-            by_day = {str(i): 0 for i in range(7)}
-            for r in weekly:
-                by_day[r["d"]] = r["mins"]
-
-            ordered = [by_day[str(i)] for i in [1, 2, 3, 4, 5, 6, 0]]
-            accept_rate = 0 if nudge_total == 0 else round((nudge_accept / nudge_total) * 100, 1)
-            hour = top_hour["h"] if top_hour else "22"
-            behavior = build_behavior_analysis(conn)
-            conn.close()
-
-            return self._send_json(
-                {
-                    "insights": {
-                        "weekly_minutes": ordered,
-                        "time_saved_weekly": [18, 24, 31, 36],
-                        "nudge_accept_rate": accept_rate,
-                        "ai_sentence": f"Most scrolling happens after {hour}:00.",
-                        "behavior_risk": behavior["risk_level"],
-                        "scroll_ratio_pct": behavior["scroll_ratio_pct"],
-                    }
-                }
-            )
+    def do_POST(self):
+        self._dispatch_write(self._POST_ROUTES)
 
-        if path == "/api/export":
-            payload = {
-                "profile": row_to_dict(conn.execute("SELECT * FROM profile WHERE id = 1").fetchone()),
-                "settings": row_to_dict(conn.execute("SELECT * FROM settings WHERE id = 1").fetchone()),
-                "subscription": row_to_dict(conn.execute("SELECT * FROM subscription WHERE id = 1").fetchone()),
-                "sessions": [row_to_dict(r) for r in conn.execute("SELECT * FROM sessions ORDER BY started_at DESC LIMIT 100").fetchall()],
-                "focus_sessions": [row_to_dict(r) for r in conn.execute("SELECT * FROM focus_sessions ORDER BY created_at DESC LIMIT 100").fetchall()],
-                "nudges": [row_to_dict(r) for r in conn.execute("SELECT * FROM nudges ORDER BY created_at DESC LIMIT 100").fetchall()],
-            }
-            conn.close()
-            return self._send_json(payload)
+    def do_PUT(self):
+        self._dispatch_write(self._PUT_ROUTES)
 
-        conn.close()
-        self.send_error(404, "Not found")
+    def do_DELETE(self):
+        route = self._DELETE_ROUTES.get(urlparse(self.path).path)
+        if route is None:
+            return self.send_error(404, "Not found")
+        route(self)
 
-    def do_POST(self):
-        path = urlparse(self.path).path
+    def _dispatch_write(self, routes):
+        route = routes.get(urlparse(self.path).path)
+        if route is None:
+            return self.send_error(404, "Not found")
         data = self._read_json()
-        if data is None:
+        if not isinstance(data, dict):
             return self._send_error(400, "Invalid JSON body")
-        ts = now_iso()
-
-        if path == "/api/sessions":
-            required = ["app_name", "session_type", "duration_min"]
-            if any(k not in data for k in required):
-                return self._send_error(400, "Missing required fields")
-            duration = safe_int(data.get("duration_min"), 1, minimum=1, maximum=600)
-            conn = db_conn()
-            conn.execute(
-                "INSERT INTO sessions(app_name, session_type, duration_min, productive, started_at, created_at) VALUES(?,?,?,?,?,?)",
-                (
-                    str(data["app_name"])[:100],
-                    str(data["session_type"])[:50],
-                    duration,
-                    safe_int(data.get("productive", 0), 0, minimum=0, maximum=1),
-                    data.get("started_at", ts),
-                    ts,
-                ),
-            )
-            conn.commit()
-            conn.close()
-            return self._send_json({"ok": True, "message": "Session recorded"}, 201)
-
-        if path == "/api/focus-sessions":
-            planned = safe_int(data.get("planned_min", 15), 15, minimum=5, maximum=180)
-            completed = safe_int(data.get("completed_min", planned), planned, minimum=1, maximum=planned)
-            accepted = safe_int(data.get("accepted_from_nudge", 0), 0, minimum=0, maximum=1)
-            conn = db_conn()
+        route(self, data, self._ts)
+
+    def _get_health(self):
+        self._send_json({"ok": True, "timestamp": self._ts})
+
+    def _get_integrations(self):
+        self._send_json_bytes(INTEGRATIONS_BODY)
+
+    def _get_behavior(self):
+        self._send_cached_json("behavior", lambda: {"behavior": build_behavior_analysis(db_conn())})
+
+    def _get_profile(self):
+        self._send_json({"profile": fetch_dict(db_conn(), "SELECT * FROM profile WHERE id = 1")})
+
+    def _get_settings(self):
+        self._send_json({"settings": fetch_dict(db_conn(), "SELECT * FROM settings WHERE id = 1")})
+
+    def _get_subscription(self):
+        self._send_json({"subscription": fetch_dict(db_conn(), "SELECT * FROM subscription WHERE id = 1")})
+
+    def _get_dashboard(self):
+        self._send_cached_json("dashboard", lambda: {"dashboard": build_dashboard(db_conn())})
+
+    def _get_insights(self):
+        self._send_cached_json("insights", lambda: {"insights": build_insights(db_conn())})
+
+    def _get_export(self):
+        conn = db_conn()
+        payload = {
+            "profile": fetch_dict(conn, "SELECT * FROM profile WHERE id = 1"),
+            "settings": fetch_dict(conn, "SELECT * FROM settings WHERE id = 1"),
+            "subscription": fetch_dict(conn, "SELECT * FROM subscription WHERE id = 1"),
+            "sessions": fetch_dicts(conn, SQL_EXPORT_SESSIONS),
+            "focus_sessions": fetch_dicts(conn, "SELECT * FROM focus_sessions ORDER BY created_at DESC LIMIT 100"),
+            "nudges": fetch_dicts(conn, "SELECT * FROM nudges ORDER BY created_at DESC LIMIT 100"),
+        }
+        self._send_json(payload)
+
+    def _post_session(self, data, ts):
+        row = session_row(data, ts)
+        if row is None:
+            return self._send_error(400, "Missing required fields")
+        conn = db_conn()
+        with conn:
+            conn.execute(SQL_INSERT_SESSION, row)
+            conn.execute(SQL_ROLLUP_SESSION, session_rollup(row))
+        bump_write_gen()
+        self._send_json({"ok": True, "message": "Session recorded"}, 201)
+
+    def _post_session_batch(self, data, ts):
+        items = data.get("sessions")
+        if not isinstance(items, list) or not items:
+            return self._send_error(400, "Invalid sessions list")
+        if len(items) > MAX_BATCH_SESSIONS:
+            return self._send_error(400, "Too many sessions in batch")
+        rows = [session_row(item, ts) for item in items]
+        if any(row is None for row in rows):
+            return self._send_error(400, "Missing required fields")
+        conn = db_conn()
+        with conn:
+            conn.executemany(SQL_INSERT_SESSION, rows)
+            conn.executemany(SQL_ROLLUP_SESSION, [session_rollup(row) for row in rows])
+        bump_write_gen()
+        self._send_json({"ok": True, "inserted": len(rows)}, 201)
+
+    def _post_focus_session(self, data, ts):
+        planned = safe_int(data.get("planned_min", 15), 15, minimum=5, maximum=180)
+        completed = safe_int(data.get("completed_min", planned), planned, minimum=1, maximum=planned)
+        accepted = safe_int(data.get("accepted_from_nudge", 0), 0, minimum=0, maximum=1)
+        conn = db_conn()
+        with conn:
             conn.execute(
                 "INSERT INTO focus_sessions(planned_min, completed_min, accepted_from_nudge, created_at) VALUES(?,?,?,?)",
                 (planned, completed, accepted, ts),
             )
-            conn.commit()
-            conn.close()
-            return self._send_json({"ok": True, "saved_minutes": completed}, 201)
-
-        if path == "/api/nudges":
-            reason = str(data.get("trigger_reason", "scroll_threshold"))[:100]
-            response = str(data.get("response", "dismiss"))
-            if response not in ALLOWED_RESPONSES:
-                return self._send_error(400, "Invalid nudge response")
-            conn = db_conn()
+            conn.execute(SQL_ROLLUP_FOCUS, (ts, completed))
+        bump_write_gen()
+        self._send_json({"ok": True, "saved_minutes": completed}, 201)
+
+    def _post_nudge(self, data, ts):
+        reason = str(data.get("trigger_reason", "scroll_threshold"))[:100]
+        response = str(data.get("response", "dismiss"))
+        if response not in ALLOWED_RESPONSES:
+            return self._send_error(400, "Invalid nudge response")
+        conn = db_conn()
+        with conn:
             conn.execute(
                 "INSERT INTO nudges(trigger_reason, response, created_at) VALUES(?,?,?)",
                 (reason, response, ts),
             )
-            conn.commit()
-            conn.close()
-            return self._send_json({"ok": True}, 201)
-
-        self.send_error(404, "Not found")
-
-    def do_PUT(self):
-        path = urlparse(self.path).path
-        data = self._read_json()
-        if data is None:
-            return self._send_error(400, "Invalid JSON body")
-        ts = now_iso()
+        bump_write_gen()
+        self._send_json({"ok": True}, 201)
 
-        if path == "/api/profile":
-            conn = db_conn()
+    def _put_profile(self, data, ts):
+        conn = db_conn()
+        with conn:
             conn.execute(
                 "UPDATE profile SET name=?, goal_minutes=?, timezone=?, updated_at=? WHERE id=1",
                 (
@@ -469,15 +878,15 @@ class Handler(BaseHTTPRequestHandler):
                     ts,
                 ),
             )
-            conn.commit()
-            conn.close()
-            return self._send_json({"ok": True})
-
-        if path == "/api/settings":
-            theme = str(data.get("theme", "light"))
-            if theme not in ALLOWED_THEMES:
-                return self._send_error(400, "Invalid theme")
-            conn = db_conn()
+        bump_write_gen()
+        self._send_json({"ok": True})
+
+    def _put_settings(self, data, ts):
+        theme = str(data.get("theme", "light"))
+        if theme not in ALLOWED_THEMES:
+            return self._send_error(400, "Invalid theme")
+        conn = db_conn()
+        with conn:
             conn.execute(
                 """
                 UPDATE settings
@@ -495,43 +904,88 @@ class Handler(BaseHTTPRequestHandler):
                     ts,
                 ),
             )
-            conn.commit()
-            conn.close()
-            return self._send_json({"ok": True})
-
-        if path == "/api/subscription":
-            plan = str(data.get("plan", "free"))
-            if plan not in {"free", "pro"}:
-                return self._send_error(400, "Invalid plan")
-            conn = db_conn()
+        bump_write_gen()
+        self._send_json({"ok": True})
+
+    def _put_subscription(self, data, ts):
+        plan = str(data.get("plan", "free"))
+        if plan not in ALLOWED_PLANS:
+            return self._send_error(400, "Invalid plan")
+        conn = db_conn()
+        with conn:
             conn.execute(
                 "UPDATE subscription SET plan=?, updated_at=? WHERE id=1",
                 (plan, ts),
             )
-            conn.commit()
-            conn.close()
-            return self._send_json({"ok": True, "plan": plan})
-
-        self.send_error(404, "Not found")
+        bump_write_gen()
+        self._send_json({"ok": True, "plan": plan})
 
-    def do_DELETE(self):
-        path = urlparse(self.path).path
-        if path != "/api/data":
-            return self.send_error(404, "Not found")
+    def _delete_data(self):
         conn = db_conn()
-        conn.execute("DELETE FROM sessions")
-        conn.execute("DELETE FROM focus_sessions")
-        conn.execute("DELETE FROM nudges")
-        conn.commit()
-        conn.close()
+        with conn:
+            conn.execute("DELETE FROM sessions")
+            conn.execute("DELETE FROM focus_sessions")
+            conn.execute("DELETE FROM nudges")
+            conn.execute("DELETE FROM daily_stats")
+        bump_write_gen()
         self._send_json({"ok": True, "message": "Activity data deleted"})
 
+    _GET_ROUTES = {
+        "/api/health": _get_health,
+        "/api/integrations": _get_integrations,
+        "/api/behavior/analyze": _get_behavior,
+        "/api/profile": _get_profile,
+        "/api/settings": _get_settings,
+        "/api/subscription": _get_subscription,
+        "/api/dashboard": _get_dashboard,
+        "/api/insights": _get_insights,
+        "/api/export": _get_export,
+    }
+    _POST_ROUTES = {
+        "/api/sessions": _post_session,
+        "/api/sessions/batch": _post_session_batch,
+        "/api/focus-sessions": _post_focus_session,
+        "/api/nudges": _post_nudge,
+    }
+    _PUT_ROUTES = {
+        "/api/profile": _put_profile,
+        "/api/settings": _put_settings,
+        "/api/subscription": _put_subscription,
+    }
+    _DELETE_ROUTES = {
+        "/api/data": _delete_data,
+    }
+
+
+class PooledHTTPServer(ThreadingHTTPServer):
+    # listen() backlog: connections the kernel holds while every slot below is taken.
+    request_queue_size = HTTP_BACKLOG
+
+    def __init__(self, server_address, handler_class, workers=HTTP_WORKERS, backlog=HTTP_BACKLOG):
+        super().__init__(server_address, handler_class)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="smtg-http")
+        # Caps running + queued connections; once full, accept() waits and new clients queue in the listen backlog.
+        self._slots = threading.BoundedSemaphore(backlog)
+
+    def process_request(self, request, client_address):
+        self._slots.acquire()
+        future = self._executor.submit(self.process_request_thread, request, client_address)
+        future.add_done_callback(lambda _: self._slots.release())
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=self.block_on_close)
+
 
 def run(port=4173):
     init_db()
-    server = HTTPServer(("0.0.0.0", port), Handler)
+    load_hot_static()
+    server = PooledHTTPServer(("0.0.0.0", port), Handler)
     print(f"SMTG server running at http://0.0.0.0:{port}")
-    server.serve_forever()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
 
 
 if __name__ == "__main__":